@@ -1,27 +1,80 @@
 # backend/ai.py
 import os
+import time
+import random
+import asyncio
+from email.utils import parsedate_to_datetime
+import httpx
 from dotenv import load_dotenv
-from openai import OpenAI
 
 load_dotenv()
 
-def get_client():
-    return OpenAI(
-        base_url="https://openrouter.ai/api/v1",
-        api_key=os.getenv("OPENROUTER_API_KEY"),
-        default_headers={
-            "HTTP-Referer": os.getenv("SITE_URL", "http://localhost:5173"),
-            "X-Title": os.getenv("SITE_NAME", "SmartDocChecker")
-        }
-    )
-
-def ask_model(system, user, model="openai/gpt-4o-mini"):
-    client = get_client()
-    resp = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": system},
-            {"role": "user", "content": user}
-        ]
-    )
-    return resp.choices[0].message.content
+OPENROUTER_URL = "https://openrouter.ai/api/v1"
+MODEL = "openai/gpt-4o-mini"
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+BACKOFF_BASE = 1.0   # seconds; doubled per attempt, with jitter
+BACKOFF_MAX = 30.0
+
+def _headers():
+    return {
+        "HTTP-Referer": os.getenv("SITE_URL", "http://localhost:5173"),
+        "X-Title": os.getenv("SITE_NAME", "SmartDocChecker")
+    }
+
+def _messages(system, user):
+    # Static system prompt first, marked cacheable for providers that need an
+    # explicit breakpoint (Anthropic, Gemini); OpenAI caches prefixes itself.
+    # Both only cache prefixes of 1024+ tokens, so nli's ~60-80 token system
+    # prompts are not cached today; the hint matters only if they grow.
+    return [
+        {"role": "system", "content": [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]},
+        {"role": "user", "content": user}
+    ]
+
+def _retry_after(resp: httpx.Response):
+    # Retry-After is either delta-seconds or an HTTP date
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError):
+        return None
+
+def _backoff(attempt: int, resp: httpx.Response = None) -> float:
+    hint = _retry_after(resp) if resp is not None else None
+    if hint is not None:
+        return min(max(hint, 0.0), BACKOFF_MAX)
+    return min(BACKOFF_BASE * 2 ** attempt, BACKOFF_MAX) * random.uniform(0.5, 1.0)
+
+def new_client() -> httpx.AsyncClient:
+    """Pooled HTTP/2 client for ask_model_async; share one per event loop."""
+    return httpx.AsyncClient(timeout=30, http2=True, limits=httpx.Limits(max_keepalive_connections=32))
+
+async def ask_model_async(system, user, model=MODEL, client: httpx.AsyncClient = None):
+    # Over a caller-owned AsyncClient so many calls share connections and run in
+    # flight. 429s, 5xx and transport errors are retried up to MAX_RETRIES times.
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            resp = await client.post(
+                f"{OPENROUTER_URL}/chat/completions",
+                headers={"Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY')}", **_headers()},
+                json={
+                    "model": model,
+                    "messages": _messages(system, user)
+                }
+            )
+        except httpx.TransportError:
+            if attempt == MAX_RETRIES:
+                raise
+            await asyncio.sleep(_backoff(attempt))
+            continue
+        if (resp.status_code == 429 or resp.status_code >= 500) and attempt < MAX_RETRIES:
+            await asyncio.sleep(_backoff(attempt, resp))
+            continue
+        resp.raise_for_status()
+        return resp.json()["choices"][0]["message"]["content"]
@@ -5,6 +5,10 @@ import uuid
 import asyncio
 from typing import List
 
+import aiofiles
+import httpx
+import msgspec
+
 # --- Make imports robust whether launched from root or /backend
 HERE = os.path.dirname(__file__)
 ROOT = os.path.abspath(os.path.join(HERE, ".."))
@@ -12,16 +16,19 @@ for p in [ROOT, HERE]:
     if p not in sys.path:
         sys.path.insert(0, p)
 
-from fastapi import FastAPI, UploadFile, Form, HTTPException
+from fastapi import FastAPI, UploadFile, Form, HTTPException, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, ORJSONResponse
 
 # Use absolute package-style imports that work with sys.path tweak
 from backend.storage import init_user, new_batch, add_doc, record_conflicts, get_batch, incr, get_totals
-from backend.models import AnalyzeResponse, ReportResponse
-from backend.nli import detect_conflicts
-from reportlab.pdfgen import canvas
-from backend.openmeter import ingest_event
+from backend.models import AnalyzeResponse, ReportResponse, AnalyzeOut, ConflictOut, ReportOut
+from backend.nli import detect_conflicts, Document, MAX_CONCURRENCY
+from ai import new_client
+from backend.report import build_report, shutdown as shutdown_report_pool
+from backend import openmeter
+from backend import monitor
 
 # -----------------------------------------------------------------------------
 # Config
@@ -35,7 +42,7 @@ os.makedirs(REPORT_DIR, exist_ok=True)
 # -----------------------------------------------------------------------------
 # App + CORS
 # -----------------------------------------------------------------------------
-app = FastAPI(title="Smart Doc Checker")
+app = FastAPI(title="Smart Doc Checker", default_response_class=ORJSONResponse)
 
 origins = [
     SITE_URL,
@@ -50,13 +57,41 @@ app.add_middleware(
     allow_headers=["*"],
 )  # CORS configuration per FastAPI guide [web:129].
 
+_llm_client = None  # OpenRouter connections kept alive across /analyze calls
+
+@app.on_event("startup")
+async def _start_llm_client():
+    global _llm_client
+    _llm_client = new_client()
+
+@app.on_event("startup")
+async def _start_metering():
+    openmeter.start()  # Batches usage events off the request path
+
+@app.on_event("startup")
+async def _start_monitor():
+    monitor.start(reanalyze_batch)  # One poller task for every watched URL
+
+@app.on_event("shutdown")
+async def _shutdown():
+    global _llm_client
+    shutdown_report_pool()
+    await openmeter.stop()
+    await monitor.stop()
+    if _llm_client is not None:
+        await _llm_client.aclose()
+        _llm_client = None
+
 # -----------------------------------------------------------------------------
 # Helpers
 # -----------------------------------------------------------------------------
-def save_upload(file: UploadFile) -> str:
+CHUNK_SIZE = 1 << 20
+
+async def save_upload(file: UploadFile) -> str:
     path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}_{file.filename}")
-    with open(path, "wb") as f:
-        f.write(file.file.read())
+    async with aiofiles.open(path, "wb") as f:
+        while chunk := await file.read(CHUNK_SIZE):  # Constant memory per upload
+            await f.write(chunk)
     return path  # Persist file for analysis and reporting [web:113].
 
 def read_text(path: str) -> str:
@@ -64,12 +99,19 @@ def read_text(path: str) -> str:
     with open(path, "r", encoding="utf-8", errors="ignore") as f:
         return f.read()  # Minimal ingestion for prototype [web:113].
 
-def run_async(coro):
-    try:
-        return asyncio.run(coro)
-    except RuntimeError:
-        loop = asyncio.get_event_loop()
-        return loop.create_task(coro)  # Safe when uvicorn already has a loop [web:113].
+async def detect_all(texts, client: httpx.AsyncClient = None) -> list:
+    # Every document pair, sharing one client and concurrency bound. Without a
+    # client (reanalyze_batch runs its own loop) one is opened for this call.
+    if client is None:
+        async with new_client() as c:
+            return await detect_all(texts, c)
+    sem = asyncio.Semaphore(MAX_CONCURRENCY)
+    docs = [(name, Document(text)) for name, text in texts]  # split and embedded once per document
+    results = await asyncio.gather(*[
+        detect_conflicts(*docs[i], *docs[j], client=client, sem=sem)
+        for i in range(len(docs)) for j in range(i + 1, len(docs))
+    ])  # Uses OpenRouter per its quickstart/auth docs [web:14][web:22][web:15].
+    return [cf for pair_conflicts in results for cf in pair_conflicts]
 
 # -----------------------------------------------------------------------------
 # Routes
@@ -81,27 +123,28 @@ def init(user_id: str = Form(...)):
     return {"batch_id": bid, "totals": get_totals(user_id)}  # Initialize user totals and batch [web:113].
 
 @app.post("/upload")
-def upload(file: UploadFile, batch_id: str = Form(...), user_id: str = Form(...)):
+async def upload(file: UploadFile, background_tasks: BackgroundTasks, batch_id: str = Form(...), user_id: str = Form(...)):
     if not file:
         raise HTTPException(status_code=400, detail="No file provided")  # Basic validation for request body [web:113].
-    path = save_upload(file)
+    path = await save_upload(file)
     add_doc(batch_id, path)
     try:
-        _ = read_text(path)  # Parse must succeed before metering
-        run_async(ingest_event(
+        _ = await run_in_threadpool(read_text, path)  # Parse must succeed before metering
+        background_tasks.add_task(
+            openmeter.enqueue,
             "doc.analyzed",
             subject=path,
             user_id=user_id,
             units=1,
             extra={"batch_id": batch_id, "filename": os.path.basename(path)}
-        ))  # Send CloudEvent with Bearer auth to OpenMeter Cloud [web:76][web:81][web:87].
+        )  # Batched CloudEvent with Bearer auth to OpenMeter Cloud [web:76][web:81][web:87].
         incr(user_id, "docs_analyzed", 1)
     except Exception as e:
-        return JSONResponse({"ok": False, "error": f"parse_failed: {e}"}, status_code=200)  # Don’t meter on failure [web:76].
+        return ORJSONResponse({"ok": False, "error": f"parse_failed: {e}"}, status_code=200)  # Don’t meter on failure [web:76].
     return {"ok": True, "path": path}  # Frontend can refresh totals after [web:113].
 
 @app.post("/analyze", response_model=AnalyzeResponse)
-def analyze(batch_id: str = Form(...), user_id: str = Form(...)):
+async def analyze(batch_id: str = Form(...), user_id: str = Form(...)):
     batch = get_batch(batch_id)
     docs: List[str] = batch.get("docs", [])
     if len(docs) < 2:
@@ -109,60 +152,45 @@ def analyze(batch_id: str = Form(...), user_id: str = Form(...)):
     texts = []
     for p in docs:
         try:
-            texts.append((os.path.basename(p), read_text(p)))
+            texts.append((os.path.basename(p), await run_in_threadpool(read_text, p)))
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Failed to read {p}: {e}")  # Handle malformed inputs [web:113].
-    conflicts = []
-    for i in range(len(texts)):
-        for j in range(i + 1, len(texts)):
-            a_name, a_text = texts[i]
-            b_name, b_text = texts[j]
-            conflicts.extend(detect_conflicts(a_name, a_text, b_name, b_text))  # Uses OpenRouter per its quickstart/auth docs [web:14][web:22][web:15].
+    conflicts = await detect_all(texts, _llm_client)
     record_conflicts(batch_id, conflicts)
     totals = get_totals(user_id)
-    return AnalyzeResponse(
+    resp = AnalyzeOut(
         batch_id=batch_id,
-        conflicts=conflicts,
+        conflicts=msgspec.convert(conflicts, List[ConflictOut]),
         docs_analyzed=totals["docs_analyzed"],
         reports_generated=totals["reports_generated"],
-    )  # Typed response for frontend [web:113].
+    )
+    return ORJSONResponse(msgspec.to_builtins(resp))  # Typed response for frontend, skips pydantic re-validation [web:113].
 
 @app.post("/report", response_model=ReportResponse)
-def report(batch_id: str = Form(...), user_id: str = Form(...)):
+async def report(background_tasks: BackgroundTasks, batch_id: str = Form(...), user_id: str = Form(...)):
     batch = get_batch(batch_id)
     conflicts = batch.get("conflicts", [])
     report_path = os.path.join(REPORT_DIR, f"{batch_id}.pdf")
 
-    c = canvas.Canvas(report_path)
-    c.setTitle("Smart Doc Checker - Contradictions Report")
-    c.drawString(30, 800, "Smart Doc Checker - Contradictions Report")
-    y = 780
-    for k, cf in enumerate(conflicts[:300], start=1):
-        line = f"{k}. [{cf['doc_a']}] {cf['span_a']} || [{cf['doc_b']}] {cf['span_b']}"
-        for seg in [line[i:i+95] for i in range(0, len(line), 95)]:
-            c.drawString(30, y, seg); y -= 14
-            if y < 40: c.showPage(); y = 800
-        expl = f"    -> {cf.get('explanation','')}"
-        for seg in [expl[i:i+95] for i in range(0, len(expl), 95)]:
-            c.drawString(30, y, seg); y -= 14
-            if y < 40: c.showPage(); y = 800
-    c.save()  # Simple paginated report for demo [web:113].
-
-    run_async(ingest_event(
+    await run_in_threadpool(build_report, conflicts, report_path)  # Paginated report, chunks laid out in parallel [web:113].
+
+    background_tasks.add_task(
+        openmeter.enqueue,
         "report.generated",
         subject=batch_id,
         user_id=user_id,
         units=1,
         extra={"conflict_count": len(conflicts)}
-    ))  # Meter on success with OpenMeter’s events API [web:76][web:87].
+    )  # Meter on success with OpenMeter’s events API [web:76][web:87].
     incr(user_id, "reports_generated", 1)
     totals = get_totals(user_id)
-    return ReportResponse(
+    resp = ReportOut(
         batch_id=batch_id,
         report_url=f"/download/{batch_id}",
         docs_analyzed=totals["docs_analyzed"],
         reports_generated=totals["reports_generated"],
-    )  # Return download path and counters [web:113].
+    )
+    return ORJSONResponse(msgspec.to_builtins(resp))  # Return download path and counters [web:113].
 
 @app.get("/download/{batch_id}")
 def download(batch_id: str):
@@ -172,8 +200,13 @@ def download(batch_id: str):
     return FileResponse(path, media_type="application/pdf", filename=f"report_{batch_id}.pdf")  # Static file serving [web:113].
 
 def reanalyze_batch(batch_id: str):
-    # Placeholder hook for external monitor integration (e.g., Pathway or polling)
+    # Called by monitor when a watched URL changes (or an external hook). Runs off
+    # the event loop; pairs whose sentences didn't change replay from cache.
     try:
-        _ = get_batch(batch_id)
-    except Exception:
-        pass  # No-op in demo [web:113].
+        batch = get_batch(batch_id)
+    except KeyError:
+        return
+    texts = [(os.path.basename(p), read_text(p)) for p in batch.get("docs", [])]
+    if len(texts) < 2:
+        return
+    record_conflicts(batch_id, asyncio.run(detect_all(texts)))
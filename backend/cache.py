@@ -0,0 +1,43 @@
+# backend/cache.py
+import os, time, sqlite3, threading
+from typing import Optional
+
+CACHE_DB = os.getenv("CACHE_DB", os.path.join("data", "cache.db"))
+CACHE_TTL = int(os.getenv("CACHE_TTL", str(30 * 24 * 3600)))
+CACHE_MAX_ROWS = int(os.getenv("CACHE_MAX_ROWS", "200000"))
+PRUNE_EVERY = 1000  # writes between prunes
+os.makedirs(os.path.dirname(CACHE_DB) or ".", exist_ok=True)
+
+# Persistent memo for pure functions of their inputs (pair verdicts).
+# Keys are digests; ns keeps unrelated callers apart. Rows expire after
+# CACHE_TTL and the oldest go first once there are more than CACHE_MAX_ROWS.
+_conn = sqlite3.connect(CACHE_DB, check_same_thread=False, isolation_level=None)
+_conn.execute("PRAGMA journal_mode=WAL")
+_conn.executescript("""
+CREATE TABLE IF NOT EXISTS kv (ns TEXT NOT NULL, key BLOB NOT NULL, value TEXT NOT NULL, ts REAL NOT NULL, PRIMARY KEY (ns, key));
+CREATE INDEX IF NOT EXISTS kv_ts ON kv (ts);
+""")
+_lock = threading.Lock()
+_writes = 0
+
+def prune():
+    """Delete expired rows, then the oldest beyond CACHE_MAX_ROWS."""
+    with _lock:
+        _conn.execute("DELETE FROM kv WHERE ts < ?", (time.time() - CACHE_TTL,))
+        _conn.execute("DELETE FROM kv WHERE rowid IN (SELECT rowid FROM kv ORDER BY ts DESC LIMIT -1 OFFSET ?)", (CACHE_MAX_ROWS,))
+
+def get(key: bytes, ns: str = "default") -> Optional[str]:
+    with _lock:
+        row = _conn.execute("SELECT value FROM kv WHERE ns = ? AND key = ? AND ts >= ?", (ns, key, time.time() - CACHE_TTL)).fetchone()
+    return row[0] if row else None
+
+def set(key: bytes, value: str, ns: str = "default"):
+    global _writes
+    with _lock:
+        _conn.execute("INSERT OR REPLACE INTO kv (ns, key, value, ts) VALUES (?, ?, ?, ?)", (ns, key, value, time.time()))
+        _writes += 1
+        due = _writes % PRUNE_EVERY == 0
+    if due:
+        prune()
+
+prune()
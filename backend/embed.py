@@ -0,0 +1,32 @@
+# backend/embed.py
+import os
+import threading
+from typing import List
+import numpy as np
+
+EMBED_MODEL = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+
+_encoder = None
+_encoder_lock = threading.Lock()  # first callers race in from several worker threads
+
+def get_encoder():
+    # Imported lazily: torch startup is slow and most requests never embed
+    global _encoder
+    if _encoder is None:
+        with _encoder_lock:
+            if _encoder is None:
+                from sentence_transformers import SentenceTransformer
+                _encoder = SentenceTransformer(EMBED_MODEL)
+    return _encoder
+
+def embed(texts: List[str]) -> np.ndarray:
+    # Unit-normalized rows, so a dot product is the cosine similarity
+    vecs = get_encoder().encode(list(texts), normalize_embeddings=True, convert_to_numpy=True)
+    return np.asarray(vecs, dtype=np.float32)
+
+def quantize(vecs: np.ndarray):
+    """Symmetric per-row int8: vecs ~= q * scale[:, None]. Returns (q, scale)."""
+    vecs = np.atleast_2d(np.asarray(vecs, dtype=np.float32))
+    scale = np.maximum(np.abs(vecs).max(axis=1), 1e-12) / 127
+    q = np.clip(np.rint(vecs / scale[:, None]), -127, 127).astype(np.int8)
+    return q, scale.astype(np.float32)
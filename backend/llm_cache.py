@@ -0,0 +1,204 @@
+# backend/llm_cache.py
+import os, re, json, time, hashlib, sqlite3, threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional
+import numpy as np
+import redis
+from embed import embed, quantize
+
+CACHE_DIR = os.getenv("LLM_CACHE_DIR", os.path.join("data", "llm_cache"))
+CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+SIM_THRESHOLD = float(os.getenv("LLM_CACHE_SIM_THRESHOLD", "0.9"))
+REDIS_URL = os.getenv("REDIS_URL")
+EXACT_MAX = int(os.getenv("LLM_CACHE_EXACT_MAX", "10000"))        # in-process entries
+SEMANTIC_MAX = int(os.getenv("LLM_CACHE_SEMANTIC_MAX", "50000"))  # rows per semantic index
+SCORE_BLOCK = 512  # int8 rows widened to fp32 at a time; small enough to stay in cache
+os.makedirs(CACHE_DIR, exist_ok=True)
+
+# Semantic rows (vector, scale and metadata together) in one sqlite table, so
+# a crash or a second process can't leave vectors and metadata out of step
+_db = sqlite3.connect(os.path.join(CACHE_DIR, "semantic.db"), check_same_thread=False, isolation_level=None)
+_db.execute("PRAGMA journal_mode=WAL")
+_db.executescript("""
+CREATE TABLE IF NOT EXISTS semantic (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, ts REAL NOT NULL,
+                                     text TEXT NOT NULL, response TEXT NOT NULL, q BLOB NOT NULL, scale REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS semantic_name ON semantic (name, id);
+""")
+_db_lock = threading.Lock()
+
+# Near-duplicate sentences that differ only in a figure ("30 days" vs "60 days")
+# embed almost identically but are exactly what we're looking for, so a
+# semantic hit also requires the numbers to match. The same goes for negation
+# and modality: "must" vs "must not" / "may" flips a verdict.
+_NUMS = re.compile(r'\d+(?:\.\d+)?%?')
+_POLARITY = re.compile(
+    r"\b(?:not|no|never|neither|nor|none|nothing|without|cannot|\w+n[\'’]t|"
+    r"must|shall|should|may|might|can|could|will|would|need|required|prohibited|"
+    r"forbidden|optional|mandatory|allowed|permitted)\b"
+)
+
+def _guard(text: str) -> tuple:
+    # What a semantic neighbour must share verbatim to reuse a verdict
+    return _NUMS.findall(text), _POLARITY.findall(text.lower())
+
+def prompt_key(system: str, user: str, model: str) -> str:
+    payload = json.dumps({"system": system, "user": user, "model": model}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class ExactCache:
+    """prompt_key -> response. Redis when REDIS_URL is set, else an in-process LRU of max_entries."""
+
+    def __init__(self, url: Optional[str] = None, ttl: int = CACHE_TTL, max_entries: int = EXACT_MAX):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.redis = redis.Redis.from_url(url) if url else None
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        if self.redis is not None:
+            raw = self.redis.get(f"llm:{key}")
+            return json.loads(raw)["response"] if raw else None
+        with self.lock:
+            hit = self.entries.get(key)
+            if hit is None:
+                return None
+            if time.time() - hit["ts"] >= self.ttl:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return hit["response"]
+
+    def set(self, key: str, response: str):
+        entry = {"response": response, "ts": time.time()}
+        if self.redis is not None:
+            self.redis.set(f"llm:{key}", json.dumps(entry), ex=self.ttl)
+            return
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+@lru_cache(maxsize=1024)
+def _embed_one(text: str) -> np.ndarray:
+    # lookup() and store() embed the same text back to back on a miss
+    return embed([text])[0]
+
+class SemanticCache:
+    """Cosine nearest neighbour over past prompts, persisted to the semantic table.
+
+    Vectors are held as int8 with a per-row scale (a quarter of the fp32
+    footprint). Scoring widens SCORE_BLOCK rows at a time to fp32 and uses the
+    BLAS matvec, so the temporary stays small and the query stays full precision.
+    Entries older than ttl are never served; past max_entries rows the oldest
+    are deleted down to three quarters of the cap.
+    """
+
+    def __init__(self, name: str, threshold: float = SIM_THRESHOLD, ttl: int = CACHE_TTL, max_entries: int = SEMANTIC_MAX):
+        self.name = name
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = []   # {id, text, response, ts}, in id (= insertion) order
+        self.matrix = None  # int8, grown by doubling; rows [:n] are live
+        self.scales = None
+        self.n = 0
+        self._load()
+
+    def _load(self):
+        with _db_lock:
+            rows = _db.execute("SELECT id, ts, text, response, q, scale FROM semantic WHERE name = ? ORDER BY id", (self.name,)).fetchall()
+        for rid, ts, text, response, q, scale in rows:
+            self._append({"id": rid, "text": text, "response": response, "ts": ts}, np.frombuffer(q, dtype=np.int8), scale)
+        self._truncate(self._first_kept(self.max_entries))
+
+    def _first_kept(self, limit: int) -> int:
+        # Index of the oldest row to keep: unexpired and among the newest `limit`
+        cutoff = time.time() - self.ttl
+        first = next((k for k in range(self.n) if self.entries[k]["ts"] >= cutoff), self.n)
+        return max(first, self.n - limit)
+
+    def _truncate(self, start: int):
+        """Drop rows [:start] from memory and the table."""
+        if start <= 0:
+            return
+        with _db_lock:
+            _db.execute("DELETE FROM semantic WHERE name = ? AND id <= ?", (self.name, self.entries[start - 1]["id"]))
+        entries, matrix, scales = self.entries[start:], self.matrix[start:self.n], self.scales[start:self.n]
+        self.entries, self.matrix, self.scales, self.n = [], None, None, 0
+        for entry, q, scale in zip(entries, matrix, scales):
+            self._append(entry, q, scale)
+
+    def _append(self, entry: dict, q: np.ndarray, scale: float):
+        if self.matrix is None or self.n == len(self.matrix):
+            size = max(64, 2 * self.n)
+            grown = np.zeros((size, q.shape[0]), dtype=np.int8)
+            scales = np.zeros(size, dtype=np.float32)
+            if self.matrix is not None:
+                grown[:self.n] = self.matrix[:self.n]
+                scales[:self.n] = self.scales[:self.n]
+            self.matrix, self.scales = grown, scales
+        self.matrix[self.n] = q
+        self.scales[self.n] = scale
+        self.entries.append(entry)
+        self.n += 1
+
+    def get(self, text: str) -> Optional[str]:
+        if not self.n:
+            return None
+        vec = np.asarray(_embed_one(text), dtype=np.float32)
+        guard, cutoff = _guard(text), time.time() - self.ttl
+        with self.lock:
+            sims = np.empty(self.n, dtype=np.float32)
+            for k in range(0, self.n, SCORE_BLOCK):
+                block = self.matrix[k:min(k + SCORE_BLOCK, self.n)]
+                sims[k:k + len(block)] = block.astype(np.float32) @ vec
+            sims *= self.scales[:self.n]
+            above = np.flatnonzero(sims >= self.threshold)
+            hits = [self.entries[i] for i in above[np.argsort(-sims[above])]]
+        for entry in hits:
+            if entry["ts"] >= cutoff and _guard(entry["text"]) == guard:
+                return entry["response"]
+        return None
+
+    def add(self, text: str, response: str):
+        q, scale = quantize(_embed_one(text))
+        ts = time.time()
+        with self.lock:
+            with _db_lock:
+                rid = _db.execute(
+                    "INSERT INTO semantic (name, ts, text, response, q, scale) VALUES (?, ?, ?, ?, ?, ?)",
+                    (self.name, ts, text, response, q[0].tobytes(), float(scale[0]))
+                ).lastrowid
+            self._append({"id": rid, "text": text, "response": response, "ts": ts}, q[0], scale[0])
+            if self.n > self.max_entries:
+                self._truncate(self._first_kept(self.max_entries * 3 // 4))
+
+_exact = ExactCache(REDIS_URL)
+_semantic = {}
+_semantic_lock = threading.Lock()
+
+def _semantic_for(system: str, model: str) -> SemanticCache:
+    # One index per (system prompt, model): verdicts don't transfer across either
+    name = hashlib.sha256(f"{system}\x00{model}".encode()).hexdigest()[:16]
+    with _semantic_lock:
+        if name not in _semantic:
+            _semantic[name] = SemanticCache(name)
+        return _semantic[name]
+
+def lookup(system: str, user: str, model: str, semantic_text: Optional[str] = None) -> Optional[str]:
+    key = prompt_key(system, user, model)
+    hit = _exact.get(key)
+    if hit is None and semantic_text:
+        hit = _semantic_for(system, model).get(semantic_text)
+        if hit is not None:
+            _exact.set(key, hit)
+    return hit
+
+def store(system: str, user: str, model: str, response: str, semantic_text: Optional[str] = None):
+    _exact.set(prompt_key(system, user, model), response)
+    if semantic_text:
+        _semantic_for(system, model).add(semantic_text, response)
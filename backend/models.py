@@ -1,6 +1,7 @@
 # backend/models.py
 from pydantic import BaseModel
 from typing import List, Optional
+import msgspec
 
 class Conflict(BaseModel):
     doc_a: str
@@ -25,3 +26,26 @@ class ReportResponse(BaseModel):
 class UsageTotals(BaseModel):
     docs_analyzed: int
     reports_generated: int
+
+# Response-path mirrors of the models above. Endpoints keep the pydantic
+# classes as response_model for the OpenAPI schema but build these, which
+# validate and encode in C.
+class ConflictOut(msgspec.Struct):
+    doc_a: str
+    span_a: str
+    doc_b: str
+    span_b: str
+    type: str
+    explanation: str
+
+class AnalyzeOut(msgspec.Struct):
+    batch_id: str
+    conflicts: List[ConflictOut]
+    docs_analyzed: int
+    reports_generated: int
+
+class ReportOut(msgspec.Struct):
+    batch_id: str
+    report_url: str
+    docs_analyzed: int
+    reports_generated: int
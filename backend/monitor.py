@@ -1,23 +1,80 @@
 # backend/monitor.py
-import time, hashlib, requests, threading
-from storage import get_batch
-from app import reanalyze_batch  # ensure function exists
+import asyncio, hashlib, logging, httpx
 
-def hash_text(t): return hashlib.sha256(t.encode()).hexdigest()
+try:
+    from blake3 import blake3 as _hash
+except ImportError:  # fall back to the stdlib
+    _hash = hashlib.sha256
+
+TICK = 1.0  # longest the poller sleeps, so new watchers start promptly
+
+log = logging.getLogger(__name__)
+
+# batch_id -> {url, interval, last, due}; every URL is polled from one task
+# over one pooled client instead of a thread per URL
+_watchers = {}
+_running = {}  # batch_id -> in-flight reanalysis task
+_on_change = None
+_client = None
+_task = None
+
+def hash_text(t): return _hash(t.encode()).hexdigest()
 
 def watch_url(batch_id: str, url: str, interval=60):
-    last = None
-    def loop():
-        nonlocal last
-        while True:
-            try:
-                html = requests.get(url, timeout=5).text
-                h = hash_text(html)
-                if last and h != last:
-                    reanalyze_batch(batch_id)
-                last = h
-            except Exception:
-                pass
-            time.sleep(interval)
-    t = threading.Thread(target=loop, daemon=True)
-    t.start()
+    """Re-analyze batch_id whenever the page at url changes, checking every interval seconds."""
+    _watchers[batch_id] = {"url": url, "interval": interval, "last": None, "due": 0.0}
+
+def unwatch(batch_id: str):
+    _watchers.pop(batch_id, None)
+
+async def _check(batch_id: str, w: dict):
+    try:
+        r = await _client.get(w["url"], timeout=5)
+        h = hash_text(r.text)
+    except Exception:
+        return
+    if w["last"] and h != w["last"]:
+        if batch_id in _running:
+            return  # keep the old hash so the change is picked up once this run ends
+        # Own task, so a slow reanalysis doesn't hold up polling of other URLs
+        _running[batch_id] = asyncio.create_task(_reanalyze(batch_id))
+    w["last"] = h
+
+async def _reanalyze(batch_id: str):
+    try:
+        await asyncio.to_thread(_on_change, batch_id)  # sync and runs its own loop
+    except Exception as e:
+        log.warning("monitor: reanalysis of %s failed: %s", batch_id, e)
+    finally:
+        _running.pop(batch_id, None)
+
+async def _poll():
+    loop = asyncio.get_running_loop()
+    while True:
+        now = loop.time()
+        due = [(bid, w) for bid, w in list(_watchers.items()) if w["due"] <= now]
+        for _, w in due:
+            w["due"] = now + w["interval"]
+        await asyncio.gather(*[_check(bid, w) for bid, w in due])
+        nxt = min((w["due"] for w in _watchers.values()), default=loop.time() + TICK)
+        await asyncio.sleep(min(TICK, max(0.0, nxt - loop.time())))
+
+def start(on_change):
+    """Start the poller; call from inside the running event loop.
+
+    on_change(batch_id) is called in a worker thread when a watched page changes.
+    """
+    global _on_change, _client, _task
+    _on_change = on_change
+    if _task is None:
+        _client = httpx.AsyncClient(http2=True, follow_redirects=True)
+        _task = asyncio.create_task(_poll())
+
+async def stop():
+    """Cancel the poller and close its client; watchers are kept for a restart."""
+    global _client, _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        await _client.aclose()
+        _client, _task = None, None
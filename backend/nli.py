@@ -1,42 +1,284 @@
 # backend/nli.py
+import os
 import re
+import json
+import hashlib
+import asyncio
+import threading
 from typing import List, Tuple
-from ai import ask_model
+from collections import defaultdict
+from functools import lru_cache
+import numpy as np
+from datasketch import MinHash, MinHashLSH
+import httpx
+import json_repair
+import cache
+import llm_cache
+from ai import ask_model_async, new_client, MODEL
+from embed import embed
+from sim_gpu import pairwise
+
+try:
+    from blingfire import text_to_sentences
+except ImportError:  # fall back to the punctuation regex
+    text_to_sentences = None
+
+try:
+    import nli_fast
+except ImportError:  # no numba: LSH candidates, np.intersect1d overlap check
+    nli_fast = None
+
+_SENT_RE = re.compile(r'(?<=[.!?])\s+')
+_WORD_RE = re.compile(r'\b\w+\b')
+_NUM_RE = re.compile(r'\b\d+%?\b')
 
 def extract_sentences(text: str) -> List[str]:
-    return re.split(r'(?<=[.!?])\s+', text.strip())
+    text = text.strip()
+    if text_to_sentences is not None:
+        return [s for s in text_to_sentences(text).split("\n") if s]
+    return _SENT_RE.split(text)
+
+LSH_THRESHOLD = 0.3
+NUM_PERM = 64
+MAX_PAIRS = 50           # sent to the LLM per document pair
+RANK_BLOCK_CELLS = 1 << 24  # similarity cells computed at once while ranking
+# Up to this many sentence pairs the numba kernel scans the full cross product
+FAST_MAX_CELLS = int(os.getenv("NLI_FAST_MAX_CELLS", str(1 << 24)))
+
+def _minhash(tokens) -> MinHash:
+    m = MinHash(num_perm=NUM_PERM)
+    m.update_batch([t.encode() for t in tokens])
+    return m
+
+_FNV_OFFSET = 0xcbf29ce484222325
+_FNV_PRIME = 0x100000001b3
+_MASK64 = (1 << 64) - 1
+
+@lru_cache(maxsize=1 << 16)
+def _fnv(tok: str) -> int:
+    h = _FNV_OFFSET
+    for byte in tok.encode():
+        h = ((h ^ byte) * _FNV_PRIME) & _MASK64
+    return h
+
+def _tok_ids(tokens) -> np.ndarray:
+    # Sorted, unique 64-bit FNV-1a hashes of a sentence's word set
+    return np.unique(np.fromiter((_fnv(t) for t in tokens), dtype=np.uint64, count=len(tokens)))
+
+if nli_fast is not None:
+    _intersect_count = nli_fast.intersect_count
+else:
+    def _intersect_count(a: np.ndarray, b: np.ndarray) -> int:
+        return np.intersect1d(a, b, assume_unique=True).size
+
+def _fast_candidates(a_toks, b_toks, sentences_a, sentences_b, limit):
+    # Exact cross product in parallel machine code; no LSH misses
+    ii, jj = nli_fast.candidate_pairs(
+        nli_fast.pack([_tok_ids(t) for t in a_toks]),
+        nli_fast.pack([_tok_ids(set(_NUM_RE.findall(s))) for s in sentences_a]),
+        nli_fast.pack([_tok_ids(t) for t in b_toks]),
+        nli_fast.pack([_tok_ids(set(_NUM_RE.findall(s))) for s in sentences_b]),
+    )
+    return np.stack([ii[:limit], jj[:limit]], axis=1)
+
+def _candidates(sentences_a: List[str], sentences_b: List[str], limit: int = None) -> np.ndarray:
+    # Overlap by shared key phrases and numbers, as an int64 (n, 2) array of
+    # (i, j) indices ordered by i, then j. Candidates
+    # come from MinHash LSH on word sets plus an inverted index of numbers, so
+    # the full cross product is never enumerated; LSH hits are checked exactly
+    # against sorted token-hash arrays rather than by intersecting string sets.
+    # With numba installed, inputs up to FAST_MAX_CELLS skip LSH for an exact scan.
+    a_toks = [set(_WORD_RE.findall(s.lower())) for s in sentences_a]
+    b_toks = [set(_WORD_RE.findall(s.lower())) for s in sentences_b]
+    if nli_fast is not None and len(sentences_a) * len(sentences_b) <= FAST_MAX_CELLS:
+        return _fast_candidates(a_toks, b_toks, sentences_a, sentences_b, limit)
+    a_ids = [_tok_ids(t) for t in a_toks]
+    b_ids = [_tok_ids(t) for t in b_toks]
+    lsh = MinHashLSH(threshold=LSH_THRESHOLD, num_perm=NUM_PERM)
+    nums_b = defaultdict(list)
+    for j, sb in enumerate(sentences_b):
+        if b_toks[j]:
+            lsh.insert(j, _minhash(b_toks[j]))
+        for tok in set(_NUM_RE.findall(sb)):
+            nums_b[tok].append(j)
+    out = []
+    for i, sa in enumerate(sentences_a):
+        hits = set()
+        if a_toks[i]:
+            hits.update(j for j in lsh.query(_minhash(a_toks[i])) if _intersect_count(a_ids[i], b_ids[j]) > 3)
+        for tok in set(_NUM_RE.findall(sa)):
+            hits.update(nums_b.get(tok, ()))
+        out.extend((i, j) for j in sorted(hits))
+        if limit is not None and len(out) >= limit:
+            break
+    return np.asarray(out[:limit], dtype=np.int64).reshape(-1, 2)
 
 def heuristic_pairs(sentences_a: List[str], sentences_b: List[str]) -> List[Tuple[str,str]]:
-    # Simple overlap by shared key phrases and numbers
-    pairs = []
-    for sa in sentences_a:
-        for sb in sentences_b:
-            if any(tok in sb for tok in re.findall(r'\b\d+%?\b', sa)) or len(set(sa.lower().split()) & set(sb.lower().split())) > 3:
-                pairs.append((sa, sb))
-    return pairs[:50]
+    return [(sentences_a[i], sentences_b[j]) for i, j in _candidates(sentences_a, sentences_b, MAX_PAIRS).tolist()]
+
+def rank_pairs(sentences_a: List[str], sentences_b: List[str], cand: np.ndarray, limit: int = MAX_PAIRS,
+               vectors_a: np.ndarray = None, vectors_b: np.ndarray = None) -> List[Tuple[str,str]]:
+    # Most similar candidates first, so the LLM budget goes to near-paraphrases.
+    # Every candidate is scored; the similarity matrix is built in row blocks of
+    # RANK_BLOCK_CELLS so memory stays bounded however many sentences qualify.
+    # vectors_a/vectors_b are whole-document embeddings when the caller has
+    # them (see Document); otherwise only the candidate sentences are embedded.
+    cand = np.asarray(cand, dtype=np.int64).reshape(-1, 2)
+    if len(cand) > limit:
+        cand = cand[np.argsort(cand[:, 0], kind="stable")]
+        ia, ai = np.unique(cand[:, 0], return_inverse=True)
+        jb, bj = np.unique(cand[:, 1], return_inverse=True)
+        ea = vectors_a[ia] if vectors_a is not None else embed([sentences_a[i] for i in ia])
+        eb = vectors_b[jb] if vectors_b is not None else embed([sentences_b[j] for j in jb])
+        scores = np.empty(len(cand), dtype=np.float32)
+        rows = max(1, RANK_BLOCK_CELLS // len(jb))
+        for start in range(0, len(ia), rows):
+            lo, hi = np.searchsorted(ai, [start, start + rows])
+            block = pairwise(ea[start:start + rows], eb)
+            scores[lo:hi] = block[ai[lo:hi] - start, bj[lo:hi]]
+        top = np.argpartition(-scores, limit)[:limit]
+        cand = cand[top[np.argsort(-scores[top], kind="stable")]]
+    return [(sentences_a[i], sentences_b[j]) for i, j in cand.tolist()]
+
+class Document:
+    """A document's sentences, with embeddings computed once on first use.
+
+    detect_all builds one per upload, so every document pair it appears in
+    shares the split and the vectors instead of redoing them.
+    """
+
+    def __init__(self, text: str):
+        self.sentences = extract_sentences(text)
+        self._vectors = None
+        self._lock = threading.Lock()
+
+    def vectors(self) -> np.ndarray:
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = embed(self.sentences)
+        return self._vectors
+
+def _rank(a: Document, b: Document, cand: np.ndarray) -> List[Tuple[str,str]]:
+    if len(cand) <= MAX_PAIRS:
+        return rank_pairs(a.sentences, b.sentences, cand)
+    return rank_pairs(a.sentences, b.sentences, cand, vectors_a=a.vectors(), vectors_b=b.vectors())
 
 PROMPT = """You compare two policy sentences for contradiction.
 Return JSON with fields: type (contradiction/overlap/neutral), explanation (1-2 sentences).
 Keep it concise and precise for compliance review."""
 
-def adjudicate(sa: str, sb: str):
-    res = ask_model(
-        "You are a compliance reviewer expert at contradictions.",
-        f"{PROMPT}\nA: {sa}\nB: {sb}"
-    )
-    return res
+BATCH_PROMPT = """You compare numbered pairs of policy sentences for contradiction.
+Reply with only a JSON array holding one object per pair:
+{"i": <pair number>, "type": "contradiction" | "overlap" | "neutral", "explanation": "<1-2 sentences>"}
+Keep it concise and precise for compliance review."""
+
+SYSTEM = "You are a compliance reviewer expert at contradictions."
+# Instructions ride in the system message, so each call's only varying text is
+# the user turn (too short for provider prompt caching as-is; see ai._messages)
+SYSTEM_PAIR = f"{SYSTEM}\n{PROMPT}"
+SYSTEM_BATCH = f"{SYSTEM}\n{BATCH_PROMPT}"
+MAX_CONCURRENCY = int(os.getenv("NLI_MAX_CONCURRENCY", "16"))
+BATCH_SIZE = int(os.getenv("NLI_BATCH_SIZE", "20"))
+
+def _pair_prompt(sa: str, sb: str) -> str:
+    return f"A: {sa}\nB: {sb}"
+
+def _parse_json(text: str):
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", text.strip())
+    try:
+        return json.loads(text)
+    except ValueError:
+        return json_repair.loads(text)
+
+def _verdict(text: str) -> dict:
+    # Cached single-pair replies (older entries hold raw model text) aren't always clean JSON
+    try:
+        obj = _parse_json(text)
+    except Exception:
+        obj = None
+    if isinstance(obj, dict) and "type" in obj:
+        return {"type": str(obj["type"]).lower(), "explanation": str(obj.get("explanation", ""))}
+    return {"type": "contradiction" if "contradiction" in text.lower() else "neutral", "explanation": text}
+
+def _pair_key(sa: str, sb: str, model: str = MODEL) -> bytes:
+    return hashlib.sha256(f"{sa}\x00{sb}\x00{model}".encode()).digest()
+
+def _cached_verdict(sa: str, sb: str):
+    # Persistent pair cache first, then the exact/semantic LLM response tiers
+    hit = cache.get(_pair_key(sa, sb), ns="verdict")
+    if hit is None:
+        hit = llm_cache.lookup(SYSTEM_PAIR, _pair_prompt(sa, sb), MODEL, f"{sa}||{sb}")
+    return _verdict(hit) if hit is not None else None
+
+def _remember(sa: str, sb: str, verdict: dict):
+    value = json.dumps(verdict)
+    cache.set(_pair_key(sa, sb), value, ns="verdict")
+    llm_cache.store(SYSTEM_PAIR, _pair_prompt(sa, sb), MODEL, value, f"{sa}||{sb}")
+
+async def adjudicate_batch(pairs: List[Tuple[str,str]], client: httpx.AsyncClient, sem: asyncio.Semaphore) -> List[dict]:
+    """One verdict dict per pair, in order; cache misses share a single model call.
+
+    Verdicts are cached per pair (by sentence hashes and under the single-pair
+    prompt), so re-runs of a batch and batches of different composition all
+    hit the same entries.
+    """
+    verdicts = list(await asyncio.gather(*[asyncio.to_thread(_cached_verdict, sa, sb) for sa, sb in pairs]))
+    todo = [k for k, v in enumerate(verdicts) if v is None]
+    if not todo:
+        return verdicts
+
+    listing = "\n".join(f"{n}. A: {pairs[k][0]}\n   B: {pairs[k][1]}" for n, k in enumerate(todo, start=1))
+    async with sem:
+        out = await ask_model_async(SYSTEM_BATCH, listing, client=client)  # cached per pair, not per reply
+    try:
+        items = _parse_json(out)
+    except Exception:
+        items = []
+    by_num = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict) or "type" not in item:
+            continue
+        try:
+            by_num[int(item["i"])] = {"type": str(item["type"]).lower(), "explanation": str(item.get("explanation", ""))}
+        except (KeyError, TypeError, ValueError):
+            continue
+
+    for n, k in enumerate(todo, start=1):
+        v = by_num.get(n)
+        if v is None:
+            verdicts[k] = {"type": "neutral", "explanation": ""}  # dropped by the model; don't cache
+            continue
+        verdicts[k] = v
+        await asyncio.to_thread(_remember, *pairs[k], v)
+    return verdicts
+
+async def _adjudicate_all(pairs, client, sem) -> List[dict]:
+    batches = [pairs[k:k + BATCH_SIZE] for k in range(0, len(pairs), BATCH_SIZE)]
+    results = await asyncio.gather(*[adjudicate_batch(b, client, sem) for b in batches])
+    return [v for batch in results for v in batch]
 
-def detect_conflicts(doc_a_name, a_text, doc_b_name, b_text):
-    a_sents, b_sents = extract_sentences(a_text), extract_sentences(b_text)
-    pairs = heuristic_pairs(a_sents, b_sents)
+async def detect_conflicts(doc_a_name, a_text, doc_b_name, b_text, client: httpx.AsyncClient = None, sem: asyncio.Semaphore = None):
+    # Pass a shared client/semaphore to bound concurrency across several document
+    # pairs, and Document objects for the texts to share their embeddings
+    a = a_text if isinstance(a_text, Document) else Document(a_text)
+    b = b_text if isinstance(b_text, Document) else Document(b_text)
+    cand = await asyncio.to_thread(_candidates, a.sentences, b.sentences)
+    pairs = await asyncio.to_thread(_rank, a, b, cand)
+    if not pairs:
+        return []
+    sem = sem or asyncio.Semaphore(MAX_CONCURRENCY)
+    if client is None:
+        async with new_client() as c:
+            verdicts = await _adjudicate_all(pairs, c, sem)
+    else:
+        verdicts = await _adjudicate_all(pairs, client, sem)
     conflicts = []
-    for sa, sb in pairs:
-        out = adjudicate(sa, sb)
-        if '"contradiction"' in out or 'contradiction' in out.lower():
+    for (sa, sb), v in zip(pairs, verdicts):
+        if v["type"] == "contradiction":
             conflicts.append({
                 "doc_a": doc_a_name, "span_a": sa,
                 "doc_b": doc_b_name, "span_b": sb,
                 "type": "contradiction",
-                "explanation": out
+                "explanation": v["explanation"]
             })
     return conflicts
@@ -0,0 +1,80 @@
+# backend/nli_fast.py
+# Numba kernels for candidate-pair generation. Importing this module requires
+# numba; nli.py falls back to MinHash LSH when it is missing.
+import threading
+import numpy as np
+from numba import njit, prange
+
+# numba's default workqueue threading layer aborts if two threads enter
+# parallel kernels at once (reanalyze_batch runs detection off the loop)
+_parallel_lock = threading.Lock()
+
+@njit(cache=True, nogil=True)
+def intersect_count(a, b):
+    # Two-pointer merge over sorted unique arrays
+    i = j = n = 0
+    while i < a.shape[0] and j < b.shape[0]:
+        if a[i] == b[j]:
+            n += 1
+            i += 1
+            j += 1
+        elif a[i] < b[j]:
+            i += 1
+        else:
+            j += 1
+    return n
+
+@njit(cache=True, nogil=True)
+def _is_pair(a_tok, a_num, b_tok, b_num, min_overlap):
+    return intersect_count(a_tok, b_tok) > min_overlap or intersect_count(a_num, b_num) > 0
+
+@njit(parallel=True, cache=True, nogil=True)
+def _row_counts(a_tok, a_tok_ptr, a_num, a_num_ptr, b_tok, b_tok_ptr, b_num, b_num_ptr, min_overlap):
+    n_a = a_tok_ptr.shape[0] - 1
+    n_b = b_tok_ptr.shape[0] - 1
+    counts = np.zeros(n_a, dtype=np.int64)
+    for i in prange(n_a):
+        at = a_tok[a_tok_ptr[i]:a_tok_ptr[i + 1]]
+        an = a_num[a_num_ptr[i]:a_num_ptr[i + 1]]
+        c = 0
+        for j in range(n_b):
+            if _is_pair(at, an, b_tok[b_tok_ptr[j]:b_tok_ptr[j + 1]], b_num[b_num_ptr[j]:b_num_ptr[j + 1]], min_overlap):
+                c += 1
+        counts[i] = c
+    return counts
+
+@njit(parallel=True, cache=True, nogil=True)
+def _fill(a_tok, a_tok_ptr, a_num, a_num_ptr, b_tok, b_tok_ptr, b_num, b_num_ptr, min_overlap, offsets, out_i, out_j):
+    n_a = a_tok_ptr.shape[0] - 1
+    n_b = b_tok_ptr.shape[0] - 1
+    for i in prange(n_a):
+        at = a_tok[a_tok_ptr[i]:a_tok_ptr[i + 1]]
+        an = a_num[a_num_ptr[i]:a_num_ptr[i + 1]]
+        k = offsets[i]
+        for j in range(n_b):
+            if _is_pair(at, an, b_tok[b_tok_ptr[j]:b_tok_ptr[j + 1]], b_num[b_num_ptr[j]:b_num_ptr[j + 1]], min_overlap):
+                out_i[k] = i
+                out_j[k] = j
+                k += 1
+
+def pack(rows) -> tuple:
+    """CSR layout of sorted uint64 arrays: (concatenated data, int64 row offsets)."""
+    ptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum([len(r) for r in rows], out=ptr[1:])
+    data = np.concatenate(rows) if rows else np.empty(0, dtype=np.uint64)
+    return data.astype(np.uint64, copy=False), ptr
+
+def candidate_pairs(a_tokens, a_nums, b_tokens, b_nums, min_overlap: int = 3):
+    """All (i, j) whose token sets share more than min_overlap hashes or any number.
+
+    Arguments are pack()ed CSR pairs. Returns (i, j) int64 arrays ordered by i, then j.
+    """
+    args = (*a_tokens, *a_nums, *b_tokens, *b_nums, min_overlap)
+    with _parallel_lock:
+        counts = _row_counts(*args)
+        offsets = np.zeros(len(counts), dtype=np.int64)
+        np.cumsum(counts[:-1], out=offsets[1:])
+        out_i = np.empty(counts.sum(), dtype=np.int64)
+        out_j = np.empty_like(out_i)
+        _fill(*args, offsets, out_i, out_j)
+    return out_i, out_j
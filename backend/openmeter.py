@@ -1,9 +1,20 @@
 # backend/openmeter.py
-import os, time, uuid, httpx
+import os, time, uuid, json, asyncio, logging, httpx
 
 OM_URL = os.getenv("OPENMETER_API_URL", "https://api.cloud.openmeter.io")
 OM_KEY = os.getenv("OPENMETER_API_KEY")
 
+BATCH_MAX = 100      # events per POST
+BATCH_WAIT = 0.25    # seconds to wait for a batch to fill
+
+log = logging.getLogger(__name__)
+
+# One pooled client per start()/stop() cycle: no TLS handshake per event
+_client = None
+_queue = None
+_worker = None
+_STOP = object()  # queued by stop(); the worker flushes everything ahead of it and exits
+
 # CloudEvents spec headers + JSON body
 def _cloudevent(event_type: str, subject: str, user_id: str, data: dict):
     # ce-id must be unique; use stable UUID when dedup desired
@@ -18,13 +29,73 @@ def _cloudevent(event_type: str, subject: str, user_id: str, data: dict):
         "data": data or {}
     }
 
-async def ingest_event(event_type: str, subject: str, user_id: str, units: int = 1, extra: dict = None):
-    evt = _cloudevent(event_type, subject, user_id, {"units": units, **(extra or {})})
-    headers = {
+def _headers(content_type: str):
+    return {
         "Authorization": f"Bearer {OM_KEY}",   # Bearer token
-        "Content-Type": "application/cloudevents+json"
+        "Content-Type": content_type
     }
-    async with httpx.AsyncClient(timeout=5) as client:
-        r = await client.post(f"{OM_URL}/api/v1/events", headers=headers, json=evt)
-        r.raise_for_status()
-        return True
+
+async def ingest_event(event_type: str, subject: str, user_id: str, units: int = 1, extra: dict = None):
+    # Synchronous send of a single event; endpoints should prefer enqueue()
+    start()
+    evt = _cloudevent(event_type, subject, user_id, {"units": units, **(extra or {})})
+    r = await _client.post(f"{OM_URL}/api/v1/events", headers=_headers("application/cloudevents+json"), json=evt)
+    r.raise_for_status()
+    return True
+
+async def _send_batch(batch: list):
+    r = await _client.post(
+        f"{OM_URL}/api/v1/events",
+        headers=_headers("application/cloudevents-batch+json"),
+        content=json.dumps(batch)
+    )
+    r.raise_for_status()
+
+async def _drain():
+    loop = asyncio.get_running_loop()
+    stopping = False
+    while not stopping:
+        first = await _queue.get()
+        if first is _STOP:
+            return
+        batch = [first]
+        deadline = loop.time() + BATCH_WAIT
+        while len(batch) < BATCH_MAX:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                evt = await asyncio.wait_for(_queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            if evt is _STOP:
+                stopping = True
+                break
+            batch.append(evt)
+        try:
+            await _send_batch(batch)
+        except Exception as e:
+            log.warning("openmeter: dropped %d events: %s", len(batch), e)  # Metering must not fail requests
+
+def start():
+    """Start the batching worker; call from inside the running event loop."""
+    global _client, _queue, _worker
+    if _worker is None:
+        _client = httpx.AsyncClient(http2=True, timeout=5)
+        _queue = asyncio.Queue()
+        _worker = asyncio.create_task(_drain())
+
+async def enqueue(event_type: str, subject: str, user_id: str, units: int = 1, extra: dict = None):
+    # async so BackgroundTasks runs it on the loop, not in a worker thread
+    start()
+    _queue.put_nowait(_cloudevent(event_type, subject, user_id, {"units": units, **(extra or {})}))
+
+async def stop():
+    """Flush queued events, stop the worker and close the client."""
+    global _client, _queue, _worker
+    if _worker is not None:
+        # The worker sends its partial batch and everything still queued before exiting
+        _queue.put_nowait(_STOP)
+        await _worker
+        await _client.aclose()
+        _client, _queue, _worker = None, None, None
@@ -0,0 +1,72 @@
+# backend/report.py
+import io, os, textwrap, threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+from pypdf import PdfReader, PdfWriter
+from reportlab.pdfgen import canvas
+
+TITLE = "Smart Doc Checker - Contradictions Report"
+MAX_CONFLICTS = 300
+CHUNK_SIZE = 50   # conflicts per worker
+WRAP_WIDTH = 95
+
+_pool = None
+_pool_lock = threading.Lock()  # build_report runs in threadpool threads
+
+def _executor() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # forkserver: the server process has threads, sqlite handles and maybe
+            # torch/numba loaded, none of which survive a plain fork safely.
+            # Windows has no forkserver; spawn is safe there too.
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=multiprocessing.get_context(method))
+        return _pool
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+def _lines(k: int, cf: dict) -> List[str]:
+    line = f"{k}. [{cf['doc_a']}] {cf['span_a']} || [{cf['doc_b']}] {cf['span_b']}"
+    expl = f"    -> {cf.get('explanation','')}"
+    return textwrap.wrap(line, WRAP_WIDTH) + textwrap.wrap(expl, WRAP_WIDTH)
+
+def render_chunk(start: int, conflicts: List[dict], with_title: bool) -> bytes:
+    # Pure function of its arguments so it can run in a worker process
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf)
+    c.setTitle(TITLE)
+    y = 800
+    if with_title:
+        c.drawString(30, y, TITLE); y = 780
+    for k, cf in enumerate(conflicts, start=start):
+        for seg in _lines(k, cf):
+            c.drawString(30, y, seg); y -= 14
+            if y < 40: c.showPage(); y = 800
+    c.save()
+    return buf.getvalue()
+
+def build_report(conflicts: List[dict], path: str):
+    """Lay out chunks of conflicts in parallel and concatenate them into one PDF.
+
+    Each chunk starts on a fresh page; numbering continues across chunks.
+    """
+    conflicts = conflicts[:MAX_CONFLICTS]
+    chunks = [conflicts[k:k + CHUNK_SIZE] for k in range(0, len(conflicts), CHUNK_SIZE)] or [[]]
+    if len(chunks) == 1:
+        parts = [render_chunk(1, chunks[0], True)]
+    else:
+        futures = [_executor().submit(render_chunk, 1 + n * CHUNK_SIZE, chunk, n == 0) for n, chunk in enumerate(chunks)]
+        parts = [f.result() for f in futures]
+    writer = PdfWriter()
+    for part in parts:
+        writer.append(PdfReader(io.BytesIO(part)))
+    writer.add_metadata({"/Title": TITLE})
+    with open(path, "wb") as f:
+        writer.write(f)
@@ -0,0 +1,17 @@
+# backend/sim_gpu.py
+import os
+import numpy as np
+
+# Below this many output cells the host<->device copies cost more than the GEMM
+GPU_MIN_CELLS = int(os.getenv("SIM_GPU_MIN_CELLS", str(1 << 20)))
+
+def pairwise(a_emb: np.ndarray, b_emb: np.ndarray) -> np.ndarray:
+    """a_emb @ b_emb.T as float32; fp16 tensor-core matmul on CUDA for large inputs."""
+    if len(a_emb) * len(b_emb) >= GPU_MIN_CELLS:
+        import torch  # only for large inputs: torch startup is slow and the CPU path doesn't need it
+        if torch.cuda.is_available():
+            with torch.no_grad():
+                a = torch.from_numpy(np.ascontiguousarray(a_emb)).to("cuda").half()
+                b = torch.from_numpy(np.ascontiguousarray(b_emb)).to("cuda").half()
+                return (a @ b.T).float().cpu().numpy()
+    return np.asarray(a_emb, dtype=np.float32) @ np.asarray(b_emb, dtype=np.float32).T
@@ -1,33 +1,68 @@
 # backend/storage.py
-import uuid, os, json
+import uuid, os, sqlite3, threading
+import orjson
 
 DATA_DIR = "data"
 os.makedirs(DATA_DIR, exist_ok=True)
+STATE_DB = os.getenv("STATE_DB", os.path.join(DATA_DIR, "state.db"))
 
-state = {
-    "batches": {},  # batch_id -> {docs: [paths], conflicts: [...], totals: {...}}
-    "totals": {}    # user_id -> {docs_analyzed, reports_generated}
-}
+# Batches, their documents and per-user counters live in sqlite (WAL), so
+# state survives restarts and updates are single-row writes.
+_conn = sqlite3.connect(STATE_DB, check_same_thread=False, isolation_level=None)
+_conn.execute("PRAGMA journal_mode=WAL")
+_conn.execute("PRAGMA synchronous=NORMAL")
+_conn.executescript("""
+CREATE TABLE IF NOT EXISTS batches (id TEXT PRIMARY KEY, user_id TEXT NOT NULL, conflicts BLOB NOT NULL DEFAULT '[]');
+CREATE TABLE IF NOT EXISTS docs (batch_id TEXT NOT NULL, seq INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS docs_batch ON docs (batch_id, seq);
+CREATE TABLE IF NOT EXISTS totals (user_id TEXT PRIMARY KEY, docs_analyzed INTEGER NOT NULL DEFAULT 0, reports_generated INTEGER NOT NULL DEFAULT 0);
+""")
+_lock = threading.Lock()
+
+COUNTERS = ("docs_analyzed", "reports_generated")
 
 def init_user(user_id):
-    state["totals"].setdefault(user_id, {"docs_analyzed":0, "reports_generated":0})
+    with _lock:
+        _conn.execute("INSERT OR IGNORE INTO totals (user_id) VALUES (?)", (user_id,))
 
 def new_batch(user_id):
     bid = str(uuid.uuid4())
-    state["batches"][bid] = {"user_id": user_id, "docs": [], "conflicts": []}
+    with _lock:
+        _conn.execute("INSERT INTO batches (id, user_id) VALUES (?, ?)", (bid, user_id))
     return bid
 
 def add_doc(batch_id, path):
-    state["batches"][batch_id]["docs"].append(path)
+    with _lock:
+        cur = _conn.execute("INSERT INTO docs (batch_id, path) SELECT id, ? FROM batches WHERE id = ?", (path, batch_id))
+    if cur.rowcount == 0:
+        raise KeyError(batch_id)
 
 def record_conflicts(batch_id, conflicts):
-    state["batches"][batch_id]["conflicts"] = conflicts
+    with _lock:
+        cur = _conn.execute("UPDATE batches SET conflicts = ? WHERE id = ?", (orjson.dumps(conflicts), batch_id))
+    if cur.rowcount == 0:
+        raise KeyError(batch_id)
 
 def get_batch(batch_id):
-    return state["batches"][batch_id]
+    """{user_id, docs, conflicts} for the batch; KeyError if it doesn't exist."""
+    with _lock:
+        row = _conn.execute("SELECT user_id, conflicts FROM batches WHERE id = ?", (batch_id,)).fetchone()
+        if row is None:
+            raise KeyError(batch_id)
+        docs = [p for (p,) in _conn.execute("SELECT path FROM docs WHERE batch_id = ? ORDER BY seq", (batch_id,))]
+    return {"user_id": row[0], "docs": docs, "conflicts": orjson.loads(row[1])}
 
 def incr(user_id, key, n=1):
-    state["totals"][user_id][key] += n
+    if key not in COUNTERS:
+        raise KeyError(key)
+    with _lock:
+        cur = _conn.execute(f"UPDATE totals SET {key} = {key} + ? WHERE user_id = ?", (n, user_id))
+    if cur.rowcount == 0:
+        raise KeyError(user_id)
 
 def get_totals(user_id):
-    return state["totals"][user_id]
+    with _lock:
+        row = _conn.execute("SELECT docs_analyzed, reports_generated FROM totals WHERE user_id = ?", (user_id,)).fetchone()
+    if row is None:
+        raise KeyError(user_id)
+    return dict(zip(COUNTERS, row))